@@ -1,154 +1,507 @@
 import argparse
-from typing import List
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, NamedTuple, Optional
 
 import ollama
-from pydantic import (
-    BaseModel,
-    Field,
-    field_validator,
+import orjson
+
+# Clients are created once at module scope so every request reuses the same
+# keep-alive connection pool instead of paying TCP setup per call. The sync
+# client covers one-off calls like list(); the async clients serve the
+# benchmark hot path. With --ollama-hosts, prompts are sharded round-robin
+# across one async client per server.
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST")
+CLIENT = ollama.Client(host=OLLAMA_HOST, timeout=120)
+clients = [ollama.AsyncClient(host=OLLAMA_HOST, timeout=120)]
+
+# Keep the model resident between prompts so only the first request per
+# model pays load_duration; the rest are pure inference.
+KEEP_ALIVE = "30m"
+
+# Each Ollama server handles up to its own OLLAMA_NUM_PARALLEL requests
+# concurrently, so bound in-flight prompts per host -- one semaphore per
+# client -- instead of splitting a single global budget across hosts. Both
+# bounds can be resized via --num-parallel / --max-loaded-models.
+NUM_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", "4"))
+client_sems = [asyncio.Semaphore(NUM_PARALLEL) for _ in clients]
+
+# Likewise cap concurrent models at what the server will keep loaded, so a
+# second model only starts when it can actually coexist in VRAM.
+model_sem = asyncio.Semaphore(int(os.environ.get("OLLAMA_MAX_LOADED_MODELS", "2")))
+
+# Serializes streamed token output in verbose mode: concurrent prompts
+# would otherwise interleave their tokens on stdout unreadably.
+_verbose_lock = asyncio.Lock()
+
+# Disk writes happen off the critical path: a single-worker executor
+# serializes appends so concurrent benchmarks never race on a file, and
+# inference never blocks on disk. log_path gets raw server payloads
+# (--log-responses); results_path gets one Stats record per completed
+# benchmark (--results-file), so an interrupted sweep keeps everything
+# measured so far and a second process can tail the file live.
+log_path: Optional[Path] = None
+results_path: Optional[Path] = None
+_log_executor = ThreadPoolExecutor(max_workers=1)
+
+
+def _append_jsonl(path: Path, record: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "ab") as outfile:
+        outfile.write(orjson.dumps(record) + b"\n")
+
+
+def _report_write_failure(future):
+    # Submitted futures are otherwise discarded, which would swallow an
+    # unwritable path or a full disk and let the run finish having
+    # persisted nothing.
+    exc = future.exception()
+    if exc is not None:
+        print(f"Warning: background write failed: {exc}")
+
+
+# Default benchmark prompts, kept at module scope as an immutable tuple so
+# argparse doesn't carry (and copy) the literal list on every parse.
+DEFAULT_PROMPTS: tuple = (
+    "In a population of giraffes, an environmental change occurs that favors individuals that are tallest. As a result, more of the taller individuals are able to obtain nutrients and survive to pass along their genetic information. This is an example of\nA. directional selection.\nB. stabilizing selection.\nC. sexual selection.\nD. disruptive selection.",
+    "Which of the changes below following the start codon in an mRNA would most likely have the greatest deleterious effect?\nA. a deletion of a single nucleotide\nB. a deletion of a nucleotide triplet\nC. a single nucleotide substitution of the nucleotide occupying the first codon position\nD. a single nucleotide substitution of the nucleotide occupying the third codon position",
+    "A feature of amino acids NOT found in carbohydrates is the presence of\nA. carbon atoms\nB. oxygen atoms\nC. nitrogen atoms\nD. hydrogen atoms",
+    "Let A and B be two sets of words (strings) from \u03a3*, for some alphabet of symbols \u03a3. Suppose that B is a subset of A. Which of the following statements must always be true of A and B ?\nI. If A is finite, then B is finite.\nII. If A is regular, then B is regular.\nIII. If A is context-free, then B is context-free.\nA. I only\nB. II only\nC. III only\nD. I and II only",
+    "The plates of a capacitor are charged to a potential difference of 5 V. If the capacitance is 2 mF, what is the charge on the positive plate?\nA. 0.005 C\nB. 0.01 C\nC. 0.02 C\nD. 0.5 C",
+    "Traveling at an initial speed of 1.5 \u00d7 10^6 m\/s, a proton enters a region of constant magnetic field, B, of magnitude 1.0 T. If the proton's initial velocity vector makes an angle of 30\u00b0 with the direction of B, compute the proton's speed 4 s after entering the magnetic field.\nA. 5.0 \u00d7 10^5 m\/s\nB. 7.5 \u00d7 10^5 m\/s\nC. 1.5 \u00d7 10^6 m\/s\nD. 3.0 \u00d7 10^6 m\/s",
+    "A group G in which (ab)^2 = a^2b^2 for all a, b in G is necessarily\nA. finite\nB. cyclic\nC. of order two\nD. abelian",
+    "The set of all real numbers under the usual multiplication operation is not a group since\nA. multiplication is not a binary operation\nB. multiplication is not associative\nC. identity element does not exist\nD. zero has no inverse",
+    "What is the difference between a direct leak and a side channel?\nA. A direct leak creates a denial of service by failing to free memory, while a channel frees memory as a side effect\nB. A direct leak is one that is intentional, rather than by unintentional\nC. A direct leak comes via the software system's intended interaction mechanism, where as a side channel leak comes from measurements of other system features, like timing, power usage, or space usage\nD. There is no difference",
+    "The four Primary Security Principles related to messages are\nA. Confidentiality, Integrity, Non repudiation and Authentication\nB. Confidentiality, Access Control, Integrity, Non repudiation\nC. Authentication, Authorization, Availability, Integrity\nD. Availability, Authorization, Confidentiality, Integrity",
 )
 
-from datetime import datetime
+# A missing comma between two adjacent string literals silently concatenates
+# them into one oversized prompt (and drops the other from the run); an
+# entry blowing past any sane prompt length is the tell.
+assert all(len(p) < 2000 for p in DEFAULT_PROMPTS), (
+    "DEFAULT_PROMPTS contains an oversized entry; check for a missing comma"
+)
+assert len(set(DEFAULT_PROMPTS)) == len(DEFAULT_PROMPTS), (
+    "DEFAULT_PROMPTS contains duplicate entries"
+)
 
 
-class Message(BaseModel):
-    role: str
-    content: str
+class Stats(NamedTuple):
+    """Per-response metrics carried through the benchmark.
 
+    A NamedTuple keeps field access at C-level tuple speed and instances
+    cheap enough to hold by the thousand across a sweep. Field order past
+    `response` matches _format_stats' arguments.
+    """
 
-class OllamaResponse(BaseModel):
     model: str
-    created_at: datetime
-    message: Message
-    done: bool
-    total_duration: int
-    load_duration: int = 0
-    prompt_eval_count: int = Field(-1, validate_default=True)
+    response: str
+    prompt_eval_count: int
     prompt_eval_duration: int
     eval_count: int
     eval_duration: int
+    load_duration: int
+    total_duration: int
 
-    @field_validator("prompt_eval_count")
-    @classmethod
-    def validate_prompt_eval_count(cls, value: int) -> int:
-        if value == -1:
-            print(
-                "\nWarning: prompt token count was not provided, potentially due to prompt caching. For more info, see https://github.com/ollama/ollama/issues/2068\n"
-            )
-            return 0  # Set default value
-        return value
 
+def _stats_from_chunk(chunk: dict) -> Stats:
+    """Build Stats from a trusted server payload without validation."""
+    prompt_eval_count = chunk.get("prompt_eval_count", -1)
+    if prompt_eval_count == -1:
+        print(
+            "\nWarning: prompt token count was not provided, potentially due to prompt caching. For more info, see https://github.com/ollama/ollama/issues/2068\n"
+        )
+        prompt_eval_count = 0
+
+    # Ollama serializes metrics with omitempty, so any zero-valued duration
+    # or count is simply absent from the final chunk (a cached prompt drops
+    # prompt_eval_duration the same way it drops prompt_eval_count).
+    # Default them all to 0 so the zero guards in _format_stats engage
+    # instead of a KeyError sinking the whole model's sweep.
+    return Stats(
+        model=chunk["model"],
+        response=chunk["response"],
+        prompt_eval_count=prompt_eval_count,
+        prompt_eval_duration=chunk.get("prompt_eval_duration", 0),
+        eval_count=chunk.get("eval_count", 0),
+        eval_duration=chunk.get("eval_duration", 0),
+        load_duration=chunk.get("load_duration", 0),
+        total_duration=chunk.get("total_duration", 0),
+    )
 
-def run_benchmark(model_name: str, prompt: str, verbose: bool) -> OllamaResponse:
 
+async def _stream_generate(
+    client: ollama.AsyncClient, model_name: str, prompt: str, verbose: bool
+):
+    """Stream one generation, returning (final chunk, accumulated parts)."""
+    # Always stream: Ollama's non-streaming path buffers the entire
+    # generation server-side and can be drastically slower than the
+    # streaming one for the same prompt. Chunks carry partial text, so
+    # accumulate them and splice the full response into the final chunk
+    # (the one carrying the duration stats).
+    stream = await client.generate(
+        model=model_name,
+        prompt=prompt,
+        stream=True,
+        keep_alive=KEEP_ALIVE,
+    )
     last_element = None
-
+    parts: List[str] = []
+    # Buffer streamed tokens and write batches straight to the binary
+    # stdout buffer: flushing per chunk costs a syscall per token, and
+    # going through the text layer re-encodes under the TextIOWrapper
+    # lock on every write. Flushes are bounded by size (256 chars) and by
+    # time (50 ms) so fast models batch heavily while slow ones still
+    # stream with a typewriter feel.
+    out = sys.stdout.buffer.write
+    flush = sys.stdout.buffer.flush
     if verbose:
-        stream = ollama.chat(
-            model=model_name,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                },
-            ],
-            stream=True,
-        )
-        for chunk in stream:
-            print(chunk["message"]["content"], end="", flush=True)
-            last_element = chunk
-    else:
-        last_element = ollama.chat(
-            model=model_name,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                },
-            ],
-        )
+        # Drain the text layer first: headers printed via print() may still
+        # sit in the TextIOWrapper buffer when stdout is block-buffered
+        # (piped/tee'd), and the binary writes below would overtake them.
+        sys.stdout.flush()
+    buf: List[str] = []
+    buf_len = 0
+    last_flush = time.monotonic()
+    async for chunk in stream:
+        content = chunk["response"]
+        parts.append(content)
+        if verbose:
+            buf.append(content)
+            buf_len += len(content)
+            now = time.monotonic()
+            if buf_len >= 256 or now - last_flush >= 0.05:
+                out("".join(buf).encode("utf-8", "replace"))
+                flush()
+                buf.clear()
+                buf_len = 0
+                last_flush = now
+        last_element = chunk
+    if verbose:
+        if buf:
+            out("".join(buf).encode("utf-8", "replace"))
+        flush()
+    return last_element, parts
+
+
+async def run_benchmark(
+    model_name: str,
+    prompt: str,
+    verbose: bool,
+    client: ollama.AsyncClient,
+    sem: asyncio.Semaphore,
+) -> Stats:
+
+    async with sem:
+        if verbose:
+            # Serialize verbose prompts so streamed tokens from concurrent
+            # generations don't interleave on stdout.
+            async with _verbose_lock:
+                last_element, parts = await _stream_generate(
+                    client, model_name, prompt, verbose
+                )
+        else:
+            last_element, parts = await _stream_generate(
+                client, model_name, prompt, verbose
+            )
 
     if not last_element:
-        print("System Error: No response received from ollama")
-        return None
+        # Raising keeps the declared Stats return honest: a None here would
+        # only resurface later as an opaque unpacking error in the totals
+        # fold, reported as a whole-model failure with no cause.
+        raise RuntimeError(
+            f"no response received from ollama for model {model_name!r}"
+        )
 
-    # with open("data/ollama/ollama_res.json", "w") as outfile:
-    #     outfile.write(json.dumps(last_element, indent=4))
+    last_element = {**last_element, "response": "".join(parts)}
 
-    return OllamaResponse.model_validate(last_element)
+    if log_path is not None:
+        _log_executor.submit(_append_jsonl, log_path, last_element).add_done_callback(
+            _report_write_failure
+        )
 
+    stats = _stats_from_chunk(last_element)
+    if results_path is not None:
+        _log_executor.submit(
+            _append_jsonl, results_path, stats._asdict()
+        ).add_done_callback(_report_write_failure)
+    return stats
 
-def nanosec_to_sec(nanosec):
-    return nanosec / 1000000000
 
+# Nanoseconds-to-seconds as a multiplication constant: cheaper than a
+# function call plus division on the stats path.
+NS_TO_S = 1e-9
 
-def inference_stats(model_response: OllamaResponse):
-    # Use properties for calculations
-    prompt_ts = model_response.prompt_eval_count / (
-        nanosec_to_sec(model_response.prompt_eval_duration)
-    )
-    response_ts = model_response.eval_count / (
-        nanosec_to_sec(model_response.eval_duration)
-    )
-    total_ts = (model_response.prompt_eval_count + model_response.eval_count) / (
-        nanosec_to_sec(
-            model_response.prompt_eval_duration + model_response.eval_duration
-        )
-    )
-
-    print(
-        f"""
+# Stats layout built once at import; per-call we only fill in the values
+# instead of re-parsing an f-string template, and write the whole block with
+# a single stdout call.
+_STATS_TEMPLATE = """
 ----------------------------------------------------
-        {model_response.model}
+        {model}
         \tPrompt eval: {prompt_ts:.2f} t/s
         \tResponse: {response_ts:.2f} t/s
         \tTotal: {total_ts:.2f} t/s
 
         Stats:
-        \tPrompt tokens: {model_response.prompt_eval_count}
-        \tResponse tokens: {model_response.eval_count}
-        \tModel load time: {nanosec_to_sec(model_response.load_duration):.2f}s
-        \tPrompt eval time: {nanosec_to_sec(model_response.prompt_eval_duration):.2f}s
-        \tResponse time: {nanosec_to_sec(model_response.eval_duration):.2f}s
-        \tTotal time: {nanosec_to_sec(model_response.total_duration):.2f}s
+        \tPrompt tokens: {prompt_eval_count}
+        \tResponse tokens: {eval_count}
+        \tModel load time: {load_time:.2f}s
+        \tPrompt eval time: {prompt_eval_time:.2f}s
+        \tResponse time: {response_time:.2f}s
+        \tTotal time: {total_time:.2f}s
 ----------------------------------------------------
-        """
+        \n"""
+
+
+def _format_stats(
+    model: str,
+    prompt_eval_count: int,
+    prompt_eval_duration: int,
+    eval_count: int,
+    eval_duration: int,
+    load_duration: int,
+    total_duration: int,
+):
+    # Durations can be 0 when the prompt was served from cache; a bare
+    # division would raise ZeroDivisionError and abort the whole run, so
+    # report 0.0 t/s for the affected rate. One fused multiply-divide on
+    # the integer nanoseconds per rate, no intermediate seconds floats.
+    prompt_ts = (
+        prompt_eval_count * 1e9 / prompt_eval_duration if prompt_eval_duration else 0.0
+    )
+    response_ts = eval_count * 1e9 / eval_duration if eval_duration else 0.0
+    total_duration_ns = prompt_eval_duration + eval_duration
+    total_ts = (
+        (prompt_eval_count + eval_count) * 1e9 / total_duration_ns
+        if total_duration_ns
+        else 0.0
+    )
+
+    sys.stdout.write(
+        _STATS_TEMPLATE.format(
+            model=model,
+            prompt_ts=prompt_ts,
+            response_ts=response_ts,
+            total_ts=total_ts,
+            prompt_eval_count=prompt_eval_count,
+            eval_count=eval_count,
+            load_time=load_duration * NS_TO_S,
+            prompt_eval_time=prompt_eval_duration * NS_TO_S,
+            response_time=eval_duration * NS_TO_S,
+            total_time=total_duration * NS_TO_S,
+        )
     )
 
 
-def average_stats(responses: List[OllamaResponse]):
-    if len(responses) == 0:
+def inference_stats(stats: Stats):
+    # Fields past `response` are already in _format_stats argument order.
+    _format_stats(stats.model, *stats[2:])
+
+
+class ModelTotals(NamedTuple):
+    """Running sums for one model; fields past `runs` feed _format_stats."""
+
+    runs: int
+    prompt_eval_count: int
+    prompt_eval_duration: int
+    eval_count: int
+    eval_duration: int
+    load_duration: int
+    total_duration: int
+
+
+def print_average_stats(model_name: str, totals: ModelTotals):
+    if totals.runs == 0:
         print("No stats to average")
         return
 
-    res = OllamaResponse(
-        model=responses[0].model,
-        created_at=datetime.now(),
-        message=Message(
-            role="system",
-            content=f"Average stats across {len(responses)} runs",
-        ),
-        done=True,
-        total_duration=sum(r.total_duration for r in responses),
-        load_duration=sum(r.load_duration for r in responses),
-        prompt_eval_count=sum(r.prompt_eval_count for r in responses),
-        prompt_eval_duration=sum(r.prompt_eval_duration for r in responses),
-        eval_count=sum(r.eval_count for r in responses),
-        eval_duration=sum(r.eval_duration for r in responses),
-    )
-    print("Average stats:")
-    inference_stats(res)
-
-
-def get_benchmark_models(skip_models: List[str] = []) -> List[str]:
-    models = ollama.list().get("models", [])
-    model_names = [model["name"] for model in models]
-    if len(skip_models) > 0:
-        model_names = [model for model in model_names if model not in skip_models]
+    print(f"Average stats across {totals.runs} runs:")
+    _format_stats(model_name, *totals[1:])
+
+
+def get_benchmark_models(
+    client: ollama.Client, skip_models: List[str] = []
+) -> List[str]:
+    model_names = [model["name"] for model in client.list().get("models", ())]
+    if skip_models:
+        # frozenset membership keeps filtering O(N+M) even for large skip lists.
+        skip = frozenset(skip_models)
+        model_names = [model for model in model_names if model not in skip]
     print(f"Evaluating models: {model_names}\n")
     return model_names
 
 
+async def embed_model(model_name: str, prompts: List[str]):
+    """Benchmark an embedding model with one batched /api/embed call.
+
+    The embed endpoint takes the whole input list in a single HTTP round
+    trip, so this measures the server's true batch throughput instead of
+    per-text request overhead. Uses its own path rather than probe/generate,
+    which embedding models can't serve.
+    """
+    async with model_sem:
+        try:
+            res = await clients[0].embed(model=model_name, input=list(prompts))
+        except Exception as e:
+            print(f"Embed benchmark failed for {model_name}: {e}")
+            return
+    total_duration = res.get("total_duration", 0)
+    load_duration = res.get("load_duration", 0)
+    prompt_eval_count = res.get("prompt_eval_count", 0)
+    eval_ns = total_duration - load_duration
+    inputs_ts = len(prompts) * 1e9 / eval_ns if eval_ns > 0 else 0.0
+    tokens_ts = prompt_eval_count * 1e9 / eval_ns if eval_ns > 0 else 0.0
+    print(
+        f"""
+----------------------------------------------------
+        {model_name}
+        \tInputs: {len(prompts)}
+        \tInput tokens: {prompt_eval_count}
+        \tThroughput: {inputs_ts:.2f} inputs/s, {tokens_ts:.2f} t/s
+        \tModel load time: {load_duration * NS_TO_S:.2f}s
+        \tTotal time: {total_duration * NS_TO_S:.2f}s
+----------------------------------------------------
+        """
+    )
+
+
+async def run_all_embeds(model_names: List[str], prompts: List[str]):
+    await asyncio.gather(*[embed_model(m, prompts) for m in model_names])
+
+
+async def bench_model(
+    model_name: str, prompts: List[str], verbose: bool
+) -> ModelTotals:
+    async with model_sem:
+        if verbose:
+            print(f"\n\nBenchmarking: {model_name}\nPrompts: {prompts}")
+        # An empty-prompt generate just loads the model, so the timed
+        # prompts below measure steady-state throughput instead of folding
+        # a multi-second cold start into the first response's stats. Every
+        # host gets warmed, since each serves a share of the prompts. The
+        # one-time load cost is reported here, outside the averages.
+        warmups = await asyncio.gather(
+            *[c.generate(model=model_name, prompt="", keep_alive=KEEP_ALIVE) for c in clients]
+        )
+        load_ns = max(w.get("load_duration", 0) for w in warmups)
+        print(
+            f"{model_name}: model load time {load_ns * NS_TO_S:.2f}s "
+            "(one-time cost, excluded from throughput averages)"
+        )
+        # Identical prompts produce identical server work, so benchmark each
+        # distinct prompt once and expand the results back afterwards.
+        unique_prompts = list(dict.fromkeys(prompts))
+        tasks = [
+            run_benchmark(
+                model_name,
+                prompt,
+                verbose,
+                clients[i % len(clients)],
+                client_sems[i % len(clients)],
+            )
+            for i, prompt in enumerate(unique_prompts)
+        ]
+        try:
+            # return_exceptions=True: without it, the first failing prompt
+            # makes the gather raise while its sibling tasks keep running in
+            # the background -- holding sem permits, streaming tokens, and
+            # appending results for a model already reported failed.
+            # Failures are collected and handled per prompt below instead.
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            # Evict the model even when the sweep fails: otherwise it sits in
+            # VRAM for the full KEEP_ALIVE and the next model's load waits on
+            # the server to reclaim the slot. Matters most with
+            # OLLAMA_MAX_LOADED_MODELS=1, where models rotate through a
+            # single slot and a lingering keep_alive would force the eviction
+            # onto the next model's critical path.
+            await asyncio.gather(
+                *[c.generate(model=model_name, prompt="", keep_alive=0) for c in clients],
+                return_exceptions=True,
+            )
+
+        cache = {}
+        for prompt, result in zip(unique_prompts, results):
+            if isinstance(result, BaseException):
+                print(f"Prompt failed for {model_name}: {result}")
+            else:
+                cache[prompt] = result
+        if not cache:
+            raise RuntimeError(f"all prompts failed for model {model_name!r}")
+
+        if verbose:
+            for prompt in unique_prompts:
+                response = cache.get(prompt)
+                if response is None:
+                    continue
+                print(f"Response: {response.response}")
+                inference_stats(response)
+
+        # Fold the (duplicate-expanded) prompt list straight into running
+        # sums: the sweep then holds O(models) integers instead of
+        # O(models x prompts) response records, and per-response data is
+        # already safe on disk via --results-file.
+        runs = pc = pd = ec = ed = ld = td = 0
+        for prompt in prompts:
+            stats = cache.get(prompt)
+            if stats is None:
+                continue
+            _m, _r, spc, spd, sec, sed, sld, std = stats
+            runs += 1
+            pc += spc
+            pd += spd
+            ec += sec
+            ed += sed
+            ld += sld
+            td += std
+        return ModelTotals(runs, pc, pd, ec, ed, ld, td)
+
+
+async def probe_model(model_name: str) -> bool:
+    """Check that a model can actually serve a request before benchmarking.
+
+    A one-token generate surfaces broken or unpullable models immediately
+    instead of minutes into their prompt sweep. keep_alive=0 unloads the
+    model again so probing doesn't occupy VRAM needed by the real runs.
+    """
+    async with model_sem:
+        try:
+            await clients[0].generate(
+                model=model_name,
+                prompt="hi",
+                options={"num_predict": 1},
+                keep_alive=0,
+            )
+            return True
+        except Exception as e:
+            print(f"Skipping {model_name}: probe failed ({e})")
+            return False
+
+
+async def run_all_benchmarks(
+    model_names: List[str], prompts: List[str], verbose: bool
+) -> dict:
+    probes = await asyncio.gather(*[probe_model(m) for m in model_names])
+    model_names = [m for m, ok in zip(model_names, probes) if ok]
+
+    results = await asyncio.gather(
+        *[bench_model(model_name, prompts, verbose) for model_name in model_names],
+        return_exceptions=True,
+    )
+
+    benchmarks = {}
+    for model_name, totals in zip(model_names, results):
+        if isinstance(totals, BaseException):
+            print(f"Benchmark failed for {model_name}: {totals}")
+            continue
+        benchmarks[model_name] = totals
+    return benchmarks
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Run benchmarks on your Ollama models."
@@ -171,46 +524,92 @@ def main():
         "-p",
         "--prompts",
         nargs="*",
-        default=[
-           "In a population of giraffes, an environmental change occurs that favors individuals that are tallest. As a result, more of the taller individuals are able to obtain nutrients and survive to pass along their genetic information. This is an example of\nA. directional selection.\nB. stabilizing selection.\nC. sexual selection.\nD. disruptive selection.",
-           "Which of the changes below following the start codon in an mRNA would most likely have the greatest deleterious effect?\nA. a deletion of a single nucleotide\nB. a deletion of a nucleotide triplet\nC. a single nucleotide substitution of the nucleotide occupying the first codon position\nD. a single nucleotide substitution of the nucleotide occupying the third codon position",
-           "A feature of amino acids NOT found in carbohydrates is the presence of\nA. carbon atoms\nB. oxygen atoms\nC. nitrogen atoms\nD. hydrogen atoms",
-           "Let A and B be two sets of words (strings) from \u03a3*, for some alphabet of symbols \u03a3. Suppose that B is a subset of A. Which of the following statements must always be true of A and B ?\nI. If A is finite, then B is finite.\nII. If A is regular, then B is regular.\nIII. If A is context-free, then B is context-free.\nA. I only\nB. II only\nC. III only\nD. I and II only",
-           "The plates of a capacitor are charged to a potential difference of 5 V. If the capacitance is 2 mF, what is the charge on the positive plate?\nA. 0.005 C\nB. 0.01 C\nC. 0.02 C\nD. 0.5 C",
-           "Traveling at an initial speed of 1.5 \u00d7 10^6 m\/s, a proton enters a region of constant magnetic field, B, of magnitude 1.0 T. If the proton's initial velocity vector makes an angle of 30\u00b0 with the direction of B, compute the proton's speed 4 s after entering the magnetic field.\nA. 5.0 \u00d7 10^5 m\/s\nB. 7.5 \u00d7 10^5 m\/s\nC. 1.5 \u00d7 10^6 m\/s\nD. 3.0 \u00d7 10^6 m\/s",
-           "A group G in which (ab)^2 = a^2b^2 for all a, b in G is necessarily\nA. finite\nB. cyclic\nC. of order two\nD. abelian",
-           "The set of all real numbers under the usual multiplication operation is not a group since\nA. multiplication is not a binary operation\nB. multiplication is not associative\nC. identity element does not exist\nD. zero has no inverse",
-           "What is the difference between a direct leak and a side channel?\nA. A direct leak creates a denial of service by failing to free memory, while a channel frees memory as a side effect\nB. A direct leak is one that is intentional, rather than by unintentional\nC. A direct leak comes via the software system's intended interaction mechanism, where as a side channel leak comes from measurements of other system features, like timing, power usage, or space usage\nD. There is no difference",
-           "The four Primary Security Principles related to messages are\nA. Confidentiality, Integrity, Non repudiation and Authentication\nB. Confidentiality, Access Control, Integrity, Non repudiation\nC. Authentication, Authorization, Availability, Integrity\nD. Availability, Authorization, Confidentiality, Integrity"
-        ],
+        default=None,
         help="List of prompts to use for benchmarking. Separate multiple prompts with spaces.",
     )
+    parser.add_argument(
+        "--prompts-file",
+        default=None,
+        help="Path to a file with one prompt per line, used instead of --prompts.",
+    )
+    parser.add_argument(
+        "--num-parallel",
+        type=int,
+        default=NUM_PARALLEL,
+        help="Max concurrent prompts in flight per host; should match each server's OLLAMA_NUM_PARALLEL.",
+    )
+    parser.add_argument(
+        "--max-loaded-models",
+        type=int,
+        default=int(os.environ.get("OLLAMA_MAX_LOADED_MODELS", "2")),
+        help="Max models benchmarked concurrently; should match the server's OLLAMA_MAX_LOADED_MODELS.",
+    )
+    parser.add_argument(
+        "--ollama-hosts",
+        nargs="*",
+        default=None,
+        help="Ollama server URLs to shard prompts across round-robin. Defaults to OLLAMA_HOST.",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=("generate", "embed"),
+        default="generate",
+        help="Benchmark text generation (default) or embedding models via one batched embed call.",
+    )
+    parser.add_argument(
+        "--results-file",
+        default="results.jsonl",
+        help="JSONL file that receives each completed benchmark record as it finishes.",
+    )
+    parser.add_argument(
+        "--log-responses",
+        nargs="?",
+        const="data/ollama/responses.jsonl",
+        default=None,
+        help="Append every raw Ollama response to this JSONL file (written in the background).",
+    )
 
     args = parser.parse_args()
 
     verbose = args.verbose
     skip_models = args.skip_models
-    prompts = args.prompts
+    if args.prompts_file is not None:
+        with open(args.prompts_file) as f:
+            prompts = [line.rstrip("\n") for line in f if line.strip()]
+    elif args.prompts is not None:
+        prompts = args.prompts
+    else:
+        prompts = list(DEFAULT_PROMPTS)
+    global log_path, results_path
+    if args.log_responses is not None:
+        log_path = Path(args.log_responses)
+    if args.results_file:
+        results_path = Path(args.results_file)
+    if args.ollama_hosts:
+        # One client per server; model listing and probes go to the first.
+        global CLIENT, clients
+        CLIENT = ollama.Client(host=args.ollama_hosts[0], timeout=120)
+        clients = [ollama.AsyncClient(host=h, timeout=120) for h in args.ollama_hosts]
+    global client_sems, model_sem
+    client_sems = [asyncio.Semaphore(args.num_parallel) for _ in clients]
+    # _verbose_lock only serializes token streams, not the per-model header,
+    # load-time, and response prints around them, so two verbose models
+    # running side by side would interleave on stdout. Run one model at a
+    # time under -v; verbose output is effectively serial anyway.
+    model_sem = asyncio.Semaphore(1 if verbose else args.max_loaded_models)
     print(f"\nVerbose: {verbose}\nSkip models: {skip_models}\nPrompts: {prompts}")
 
-    model_names = get_benchmark_models(skip_models)
-    benchmarks = {}
-
-    for model_name in model_names:
-        responses: List[OllamaResponse] = []
-        for prompt in prompts:
-            if verbose:
-                print(f"\n\nBenchmarking: {model_name}\nPrompt: {prompt}")
-            response = run_benchmark(model_name, prompt, verbose=verbose)
-            responses.append(response)
+    model_names = get_benchmark_models(CLIENT, skip_models)
+    if args.mode == "embed":
+        asyncio.run(run_all_embeds(model_names, prompts))
+        _log_executor.shutdown(wait=True)
+        return
 
-            if verbose:
-                print(f"Response: {response.message.content}")
-                inference_stats(response)
-        benchmarks[model_name] = responses
+    benchmarks = asyncio.run(run_all_benchmarks(model_names, prompts, verbose))
+    _log_executor.shutdown(wait=True)
 
-    for model_name, responses in benchmarks.items():
-        average_stats(responses)
+    for model_name, totals in benchmarks.items():
+        print_average_stats(model_name, totals)
 
 
 if __name__ == "__main__":